@@ -0,0 +1,89 @@
+# hlr_cooccur.py
+# Undirected module coupling for parse_hlr.py: which pairs of modules share signals, and which signals they share.
+#
+# The signals are held as a module x signal incidence matrix, a row of sorted signal indexes for each module.  The
+# number of signals shared by each pair of modules is the co-occurrence matrix A.A^T, computed as one sparse
+# matrix product with SciPy when it is installed, or with a pure Python sparse product (row by row, Gustavson)
+# otherwise.  The signal list of a pair is only pulled, by intersecting the two rows, when it is written.
+#
+# The pairs come out in the same order as the all-pairs loop over sorted signals and sorted module lists:
+# by the first signal they share, then by module name.
+
+import bisect
+
+try:
+    import numpy
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+
+class CoOccurrence:
+    # signal_list { signal_name : [modules] }
+    def __init__(self, signal_list):
+        self.signals = sorted(signal for signal in signal_list if len(set(signal_list[signal])) > 1)
+        self.modules = sorted(set(module for signal in self.signals for module in signal_list[signal]))
+        module_index = {module: n for n, module in enumerate(self.modules)}
+
+        # Incidence matrix, by rows (module -> [signal]) and by columns (signal -> [module]), both sorted
+        self.rows = [[] for module in self.modules]
+        self.columns = []
+        for s, signal in enumerate(self.signals):
+            column = sorted(set(module_index[module] for module in signal_list[signal]))
+            for m in column:
+                self.rows[m].append(s)
+            self.columns.append(column)
+
+        if scipy is not None:
+            counts = self.sparse_counts()
+        else:
+            counts = self.python_counts()
+
+        # { (module1, module2) : number of shared signals } in output order
+        order = sorted(counts, key=lambda pair: (counts[pair][0], pair))
+        self.pairs = {(self.modules[i], self.modules[j]): counts[(i, j)][1] for i, j in order}
+        self.pair_index = {(self.modules[i], self.modules[j]): (i, j) for i, j in order}
+
+    # { (i, j) : [first shared signal, count] } for i < j, from the sparse product with SciPy
+    def sparse_counts(self):
+        indptr = [0]
+        for row in self.rows:
+            indptr.append(indptr[-1] + len(row))
+        indices = [s for row in self.rows for s in row]
+        incidence = scipy.sparse.csr_matrix((numpy.ones(len(indices), dtype=numpy.int32), indices, indptr),
+                                            shape=(len(self.modules), len(self.signals)))
+        product = scipy.sparse.triu(incidence @ incidence.T, k=1).tocoo()
+        counts = {}
+        for i, j, count in zip(product.row.tolist(), product.col.tolist(), product.data.tolist()):
+            counts[(i, j)] = [self.first_shared(i, j), count]
+        return counts
+
+    # { (i, j) : [first shared signal, count] } for i < j, from a row by row sparse product in pure Python.
+    # The signals of row i are visited in order, so the first time a pair is seen is at its first shared signal.
+    def python_counts(self):
+        counts = {}
+        for i, row in enumerate(self.rows):
+            for s in row:
+                column = self.columns[s]
+                for j in column[bisect.bisect_right(column, i):]:
+                    if (i, j) in counts:
+                        counts[(i, j)][1] += 1
+                    else:
+                        counts[(i, j)] = [s, 1]
+        return counts
+
+    def first_shared(self, i, j):
+        row_i, row_j = self.rows[i], self.rows[j]
+        a = b = 0
+        while row_i[a] != row_j[b]:
+            if row_i[a] < row_j[b]:
+                a += 1
+            else:
+                b += 1
+        return row_i[a]
+
+    # Signals shared by a pair of modules, in sorted order
+    def pair_signals(self, pair):
+        i, j = self.pair_index[pair]
+        shared = set(self.rows[j])
+        return [self.signals[s] for s in self.rows[i] if s in shared]
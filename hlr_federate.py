@@ -0,0 +1,219 @@
+# hlr_federate.py
+# This program will query across several hlr.db files created by parse_hlr4.py, e.g. one per engine program or
+# per software release, without merging the CSV files by hand.
+#
+# The project databases are registered in hlr_projects.csv (alias, dbfile) and attached to a single in-memory
+# SQLite connection with ATTACH.  Only the module and signal names are copied into shared Modules/Signals tables
+# on the main connection, so every project maps onto the same mod_id/sig_id values; the ModSigs rows are read
+# in place from the attached databases.
+#
+# Reports:
+#   - edges:   HLR_Out, HLR_In, Signals rows, the same as hlr_signals.csv, plus the projects they appear in
+#   - orphans: signals that are output but never input, or input but never output, within a project
+#   - shared:  signals that appear in more than one project, with the projects they appear in
+# edges and orphans can be run over the union (found in any project) or the intersection (found in every project).
+
+# Usage: python hlr_federate.py add ALIAS DBFILE
+#        python hlr_federate.py remove ALIAS
+#        python hlr_federate.py list
+#        python hlr_federate.py edges [union|intersect]
+#        python hlr_federate.py orphans [union|intersect]
+#        python hlr_federate.py shared
+#
+# Note: SQLite limits the number of attached databases (10 by default), so at most 10 projects can be queried
+#   at one time.
+
+import sys
+import os
+import csv
+import sqlite3
+import pathlib
+
+# Define files
+projectfile = 'hlr_projects.csv'
+edgefile = 'hlr_federated_edges.csv'
+orphanfile = 'hlr_federated_orphans.csv'
+sharedfile = 'hlr_federated_shared.csv'
+
+
+# Read the registered projects from the project file; returns a list of (alias, dbfile)
+def read_projects():
+    projects = []
+    if os.path.exists(projectfile):
+        with open(projectfile, newline='') as myFile:
+            for row in csv.reader(myFile):
+                if len(row) == 2:
+                    projects.append((row[0], row[1]))
+    return projects
+
+
+def write_projects(projects):
+    with open(projectfile, 'w', newline='') as myFile:
+        writer = csv.writer(myFile)
+        writer.writerows(projects)
+
+
+# Open an in-memory database, attach each project as schema p0, p1, ... and intern the module and signal names
+# of all projects into the shared Modules and Signals tables.  Returns the connection and a list of
+# (schema, alias) in registration order.
+def open_federation(projects):
+    con = sqlite3.connect('file::memory:', uri=True)
+    cur = con.cursor()
+    cur.execute("CREATE TABLE Modules (mod_id INTEGER PRIMARY KEY, mod_name TEXT, UNIQUE (mod_name))")
+    cur.execute("CREATE TABLE Signals (sig_id INTEGER PRIMARY KEY, sig_name TEXT, UNIQUE (sig_name))")
+
+    schemas = []
+    for index, (alias, dbfile) in enumerate(projects):
+        if not os.path.exists(dbfile):
+            sys.exit(f'Project {alias}: database {dbfile} not found')
+        schema = f'p{index}'
+        uri = pathlib.Path(dbfile).resolve().as_uri() + '?mode=ro'  # as_uri() escapes '#', '?' and '%'
+        try:
+            cur.execute('ATTACH DATABASE ? AS ' + schema, (uri,))
+            cur.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+            tables = set(row[0].lower() for row in cur.fetchall())
+        except sqlite3.DatabaseError as error:
+            sys.exit(f'Project {alias}: cannot attach {dbfile} ({error})')
+        missing = [table for table in ('Modules', 'Signals', 'ModSigs') if table.lower() not in tables]
+        if missing:
+            sys.exit(f'Project {alias}: {dbfile} is not a parse_hlr4.py database (missing {", ".join(missing)})')
+        cur.execute(f'INSERT OR IGNORE INTO Modules (mod_name) SELECT mod_name FROM {schema}.Modules')
+        cur.execute(f'INSERT OR IGNORE INTO Signals (sig_name) SELECT sig_name FROM {schema}.Signals')
+        schemas.append((schema, alias))
+    return con, schemas
+
+
+# SQL for the (out_id, in_id, sig_id) edges of one project, using the shared ids
+def edge_select(schema):
+    return f'''SELECT DISTINCT mo.mod_id AS k0, mi.mod_id AS k1, s.sig_id AS k2
+        FROM {schema}.ModSigs o
+        JOIN {schema}.ModSigs i ON i.sig_id = o.sig_id AND i.mod_sig_type = 'Input'
+        JOIN {schema}.Modules po ON po.mod_id = o.mod_id
+        JOIN {schema}.Modules pi ON pi.mod_id = i.mod_id
+        JOIN {schema}.Signals ps ON ps.sig_id = o.sig_id
+        JOIN main.Modules mo ON mo.mod_name = po.mod_name
+        JOIN main.Modules mi ON mi.mod_name = pi.mod_name
+        JOIN main.Signals s ON s.sig_name = ps.sig_name
+        WHERE o.mod_sig_type = 'Output' '''
+
+
+# SQL for the (sig_id, orphan_type) orphans of one project, using the shared ids
+def orphan_select(schema):
+    return f'''SELECT DISTINCT s.sig_id AS k0,
+            CASE WHEN EXISTS (SELECT 1 FROM {schema}.ModSigs o
+                              WHERE o.sig_id = ps.sig_id AND o.mod_sig_type = 'Output')
+                 THEN 'Output only' ELSE 'Input only' END AS k1
+        FROM {schema}.Signals ps
+        JOIN main.Signals s ON s.sig_name = ps.sig_name
+        WHERE EXISTS (SELECT 1 FROM {schema}.ModSigs m
+                      WHERE m.sig_id = ps.sig_id AND m.mod_sig_type IN ('Input', 'Output'))
+          AND NOT (EXISTS (SELECT 1 FROM {schema}.ModSigs o
+                           WHERE o.sig_id = ps.sig_id AND o.mod_sig_type = 'Output')
+                   AND EXISTS (SELECT 1 FROM {schema}.ModSigs i
+                               WHERE i.sig_id = ps.sig_id AND i.mod_sig_type = 'Input'))'''
+
+
+# Combine the per project selects (columns k0, k1, ...) with UNION or INTERSECT.  Each row is then tagged with
+# the projects it appears in, so the report shows where a union row came from.
+def federated_rows(cur, schemas, select, key_count, mode):
+    operator = ' INTERSECT ' if mode == 'intersect' else ' UNION '
+    cur.execute('DROP TABLE IF EXISTS temp.Result')
+    cur.execute('CREATE TEMP TABLE Result AS ' + operator.join(select(schema) for schema, alias in schemas))
+
+    keys = ', '.join(f'k{n}' for n in range(key_count))
+    cur.execute('DROP TABLE IF EXISTS temp.Found')
+    cur.execute(f'CREATE TEMP TABLE Found ({keys}, alias TEXT)')
+    for schema, alias in schemas:
+        cur.execute(f'INSERT INTO temp.Found SELECT r.*, ? FROM temp.Result r '
+                    f'INTERSECT SELECT *, ? FROM ({select(schema)})', (alias, alias))
+
+    columns = ', '.join(f'r.k{n}' for n in range(key_count))
+    join = ' AND '.join(f'f.k{n} = r.k{n}' for n in range(key_count))
+    cur.execute(f"SELECT {columns}, group_concat(f.alias, ' ') FROM temp.Result r "
+                f"JOIN temp.Found f ON {join} GROUP BY {columns}")
+    return cur.fetchall()
+
+
+def report_edges(con, schemas, mode):
+    cur = con.cursor()
+    mod_dict = dict(cur.execute('SELECT mod_id, mod_name FROM Modules').fetchall())
+    sig_dict = dict(cur.execute('SELECT sig_id, sig_name FROM Signals').fetchall())
+
+    rows = federated_rows(cur, schemas, edge_select, 3, mode)
+    rows.sort(key=lambda row: (mod_dict[row[0]], mod_dict[row[1]], sig_dict[row[2]]))
+    with open(edgefile, 'w', newline='') as myFile:
+        writer = csv.writer(myFile)
+        writer.writerow(['HLR_Out', 'HLR_In', 'Signals', 'Projects'])
+        for out_id, in_id, sig_id, aliases in rows:
+            writer.writerow([mod_dict[out_id], mod_dict[in_id], sig_dict[sig_id], aliases])
+    print(f'{len(rows)} edges ({mode}) written to {edgefile}')
+
+
+def report_orphans(con, schemas, mode):
+    cur = con.cursor()
+    sig_dict = dict(cur.execute('SELECT sig_id, sig_name FROM Signals').fetchall())
+
+    rows = federated_rows(cur, schemas, orphan_select, 2, mode)
+    rows.sort(key=lambda row: (sig_dict[row[0]], row[1]))
+    with open(orphanfile, 'w', newline='') as myFile:
+        writer = csv.writer(myFile)
+        writer.writerow(['Signal', 'Orphan', 'Projects'])
+        for sig_id, orphan_type, aliases in rows:
+            writer.writerow([sig_dict[sig_id], orphan_type, aliases])
+    print(f'{len(rows)} orphans ({mode}) written to {orphanfile}')
+
+
+def report_shared(con, schemas):
+    cur = con.cursor()
+    cur.execute('DROP TABLE IF EXISTS temp.Found')
+    cur.execute('CREATE TEMP TABLE Found (sig_id INTEGER, alias TEXT)')
+    for schema, alias in schemas:
+        cur.execute(f'''INSERT INTO temp.Found
+            SELECT DISTINCT s.sig_id, ? FROM {schema}.ModSigs m
+            JOIN {schema}.Signals ps ON ps.sig_id = m.sig_id
+            JOIN main.Signals s ON s.sig_name = ps.sig_name''', (alias,))
+    cur.execute('''SELECT s.sig_name, count(*), group_concat(f.alias, ' ') FROM temp.Found f
+        JOIN Signals s ON s.sig_id = f.sig_id
+        GROUP BY f.sig_id HAVING count(*) > 1 ORDER BY s.sig_name''')
+    rows = cur.fetchall()
+    with open(sharedfile, 'w', newline='') as myFile:
+        writer = csv.writer(myFile)
+        writer.writerow(['Signal', 'Project_Count', 'Projects'])
+        writer.writerows(rows)
+    print(f'{len(rows)} shared signals written to {sharedfile}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python hlr_federate.py add|remove|list|edges|orphans|shared ...')
+    command = sys.argv[1]
+    projects = read_projects()
+
+    if command == 'add' and len(sys.argv) == 4:
+        alias, dbfile = sys.argv[2], sys.argv[3]
+        projects = [project for project in projects if project[0] != alias]
+        projects.append((alias, dbfile))
+        write_projects(projects)
+    elif command == 'remove' and len(sys.argv) == 3:
+        write_projects([project for project in projects if project[0] != sys.argv[2]])
+    elif command == 'list':
+        for alias, dbfile in projects:
+            print(f'{alias}\t{dbfile}')
+    elif command in ('edges', 'orphans', 'shared'):
+        mode = sys.argv[2] if len(sys.argv) > 2 else 'union'
+        if command == 'shared' and len(sys.argv) > 2:
+            sys.exit('Usage: python hlr_federate.py shared  (takes no mode, it compares the projects)')
+        if mode not in ('union', 'intersect'):
+            sys.exit('Mode must be union or intersect')
+        if len(projects) == 0:
+            sys.exit(f'No projects registered in {projectfile}')
+        con, schemas = open_federation(projects)
+        if command == 'edges':
+            report_edges(con, schemas, mode)
+        elif command == 'orphans':
+            report_orphans(con, schemas, mode)
+        else:
+            report_shared(con, schemas)
+        con.close()
+    else:
+        sys.exit('Usage: python hlr_federate.py add|remove|list|edges|orphans|shared ...')
@@ -0,0 +1,247 @@
+# hlr_html.py
+# This program will write a self-contained interactive HTML page of the module graph from hlr.db, as an
+# alternative to the .gfz file (needs Graphviz) and the .csv file (needs Excel).  The page opens from a local
+# file in any browser; no server is needed.
+#
+# The layout of the module graph is computed here (force directed, Fruchterman-Reingold) and embedded in the page
+# with the edge counts, so the browser only has to draw it.  The signal lists and neighbour edges of each module
+# are written as a separate compact JSON chunk, <script type="application/json" id="mN">, which the browser
+# does not parse until the module is clicked.  Large graphs therefore open instantly and only the detail of the
+# module being inspected is loaded.
+
+# Usage: python hlr_html.py [dbfile]  (dbfile defaults to hlr.db; writes hlr_signals.html)
+
+import sys
+import json
+import math
+import html
+
+from hlr_model import build_hyperedges, pair_index, pair_signals
+from hlr_snapshot import load_snapshot
+
+# Define files
+sqldbfile = 'hlr.db'
+htmlfile = 'hlr_signals.html'
+
+
+# Fruchterman-Reingold layout of nodes 0..n-1 and edges [(a, b)], returns [(x, y)] scaled to 0..1.
+# The nodes start on a circle so the layout is the same on every run.
+def layout(node_count, edges, iterations=200):
+    if node_count == 0:
+        return []
+    pos = [[math.cos(2 * math.pi * i / node_count), math.sin(2 * math.pi * i / node_count)]
+           for i in range(node_count)]
+    k = math.sqrt(4.0 / node_count)
+    temperature = 0.2
+    for iteration in range(iterations):
+        disp = [[0.0, 0.0] for i in range(node_count)]
+        for i in range(node_count):
+            for j in range(i + 1, node_count):
+                dx = pos[i][0] - pos[j][0]
+                dy = pos[i][1] - pos[j][1]
+                dist = max(math.hypot(dx, dy), 0.01)
+                force = k * k / dist
+                disp[i][0] += dx / dist * force
+                disp[i][1] += dy / dist * force
+                disp[j][0] -= dx / dist * force
+                disp[j][1] -= dy / dist * force
+        for a, b in edges:
+            dx = pos[a][0] - pos[b][0]
+            dy = pos[a][1] - pos[b][1]
+            dist = max(math.hypot(dx, dy), 0.01)
+            force = dist * dist / k
+            disp[a][0] -= dx / dist * force
+            disp[a][1] -= dy / dist * force
+            disp[b][0] += dx / dist * force
+            disp[b][1] += dy / dist * force
+        for i in range(node_count):
+            length = max(math.hypot(disp[i][0], disp[i][1]), 0.01)
+            step = min(length, temperature)
+            pos[i][0] += disp[i][0] / length * step
+            pos[i][1] += disp[i][1] / length * step
+        temperature *= 1.0 - 1.0 / iterations
+
+    min_x = min(p[0] for p in pos)
+    min_y = min(p[1] for p in pos)
+    span = max(max(p[0] for p in pos) - min_x, max(p[1] for p in pos) - min_y, 0.01)
+    return [((p[0] - min_x) / span, (p[1] - min_y) / span) for p in pos]
+
+
+# JSON for embedding in a <script> element; '</' is escaped so a signal name cannot close the element
+def embed(data):
+    return json.dumps(data, separators=(',', ':')).replace('</', '<\\/')
+
+
+def write_html(sig_dict, mod_dict, hlrout_dict, hlrin_dict):
+    mod_ids = sorted(mod_dict, key=lambda id: mod_dict[id])
+    index = {id: n for n, id in enumerate(mod_ids)}
+
+    # Collect vectors of from-to hlr modules and their list of signals {(hlrout,hlrin):[sigs]}
+    hyperedges = build_hyperedges(sig_dict, hlrout_dict, hlrin_dict)
+    vector_list = {}
+    for (x, y), edge_list in pair_index(hyperedges).items():
+        vector_list[(index[x], index[y])] = sorted(sig_dict[id] for id in pair_signals(hyperedges, edge_list))
+
+    # Module detail chunks: output/input signal lists and neighbour edges with their signals
+    chunks = [{'out': [], 'in': [], 'to': [], 'from': []} for id in mod_ids]
+    for id in sorted(sig_dict, key=lambda id: sig_dict[id]):
+        for x in set(hlrout_dict[id]):
+            chunks[index[x]]['out'].append(sig_dict[id])
+        for y in set(hlrin_dict[id]):
+            chunks[index[y]]['in'].append(sig_dict[id])
+    for (a, b), sigs in sorted(vector_list.items()):
+        chunks[a]['to'].append([b, sigs])
+        chunks[b]['from'].append([a, sigs])
+
+    pos = layout(len(mod_ids), [pair for pair in vector_list if pair[0] != pair[1]])
+    graph = {
+        'nodes': [[mod_dict[id], round(pos[n][0], 4), round(pos[n][1], 4),
+                   len(chunks[n]['out']), len(chunks[n]['in'])] for n, id in enumerate(mod_ids)],
+        'edges': [[a, b, len(sigs)] for (a, b), sigs in sorted(vector_list.items())],
+    }
+
+    myFile = open(htmlfile, 'w', encoding='utf-8')
+    myFile.write(page_head.replace('@TITLE@', html.escape(f'HLR signals ({len(mod_ids)} modules, '
+                                                          f'{len(sig_dict)} signals)')))
+    myFile.write(f'<script type="application/json" id="graph">{embed(graph)}</script>\n')
+    for n, chunk in enumerate(chunks):
+        myFile.write(f'<script type="application/json" id="m{n}">{embed(chunk)}</script>\n')
+    myFile.write(page_script)
+    myFile.close()
+
+
+page_head = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>@TITLE@</title>
+<style>
+body { margin: 0; font-family: sans-serif; font-size: 13px; display: flex; height: 100vh; }
+#graph-view { flex: 3; }
+#detail { flex: 1; overflow: auto; padding: 8px; border-left: 1px solid #ccc; }
+.node circle { fill: lightblue; stroke: #333; cursor: pointer; }
+.node.selected circle { fill: yellow; }
+.node text { pointer-events: none; }
+.edge { stroke: #999; fill: none; marker-end: url(#arrow); }
+.edge.self { stroke: red; }
+.edge.out { stroke: blue; stroke-width: 2; }
+.edge.in { stroke: green; stroke-width: 2; }
+.edge-label { fill: #666; font-size: 10px; }
+h3 { margin: 8px 0 4px; }
+ul { margin: 0; padding-left: 16px; }
+</style>
+</head>
+<body>
+<svg id="graph-view"></svg>
+<div id="detail"><h2>@TITLE@</h2><p>Click a module to show its signals.</p></div>
+'''
+
+page_script = '''<script>
+(function () {
+  var graph = JSON.parse(document.getElementById('graph').textContent);
+  var chunks = {};
+  var svg = document.getElementById('graph-view');
+  var detail = document.getElementById('detail');
+  var ns = 'http://www.w3.org/2000/svg';
+  var size = 1000, margin = 60, selected = null;
+
+  // Module detail is parsed only when first needed
+  function chunk(n) {
+    if (!(n in chunks)) {
+      chunks[n] = JSON.parse(document.getElementById('m' + n).textContent);
+    }
+    return chunks[n];
+  }
+
+  function el(name, attrs, parent) {
+    var e = document.createElementNS(ns, name);
+    for (var a in attrs) { e.setAttribute(a, attrs[a]); }
+    parent.appendChild(e);
+    return e;
+  }
+
+  function x(n) { return margin + graph.nodes[n][1] * (size - 2 * margin); }
+  function y(n) { return margin + graph.nodes[n][2] * (size - 2 * margin); }
+
+  svg.setAttribute('viewBox', '0 0 ' + size + ' ' + size);
+  var defs = el('defs', {}, svg);
+  var marker = el('marker', {id: 'arrow', viewBox: '0 0 10 10', refX: 22, refY: 5,
+                             markerWidth: 6, markerHeight: 6, orient: 'auto'}, defs);
+  el('path', {d: 'M0,0 L10,5 L0,10 z', fill: '#999'}, marker);
+
+  var edges = graph.edges.map(function (e) {
+    var path;
+    if (e[0] === e[1]) {
+      path = el('path', {'class': 'edge self', d: 'M' + x(e[0]) + ',' + y(e[0]) +
+        ' c -40,-60 40,-60 0,0'}, svg);
+    } else {
+      path = el('path', {'class': 'edge', d: 'M' + x(e[0]) + ',' + y(e[0]) +
+        ' L' + x(e[1]) + ',' + y(e[1])}, svg);
+    }
+    var label = el('text', {'class': 'edge-label', x: (x(e[0]) + x(e[1])) / 2,
+                            y: (y(e[0]) + y(e[1])) / 2 - (e[0] === e[1] ? 45 : 0)}, svg);
+    label.textContent = e[2];
+    return path;
+  });
+
+  var nodes = graph.nodes.map(function (node, n) {
+    var g = el('g', {'class': 'node', transform: 'translate(' + x(n) + ',' + y(n) + ')'}, svg);
+    el('circle', {r: 14}, g);
+    var text = el('text', {y: 26, 'text-anchor': 'middle'}, g);
+    text.textContent = node[0];
+    g.addEventListener('click', function () { select(n); });
+    return g;
+  });
+
+  function list(title, items) {
+    var h = document.createElement('h3');
+    h.textContent = title + ' (' + items.length + ')';
+    var ul = document.createElement('ul');
+    items.forEach(function (item) {
+      var li = document.createElement('li');
+      li.textContent = item;
+      ul.appendChild(li);
+    });
+    detail.appendChild(h);
+    detail.appendChild(ul);
+  }
+
+  function neighbours(title, pairs) {
+    list(title, pairs.map(function (p) {
+      return graph.nodes[p[0]][0] + ' (' + p[1].length + '): ' + p[1].join(', ');
+    }));
+  }
+
+  function select(n) {
+    if (selected !== null) { nodes[selected].classList.remove('selected'); }
+    selected = n;
+    nodes[n].classList.add('selected');
+    graph.edges.forEach(function (e, i) {
+      edges[i].classList.toggle('out', e[0] === n && e[1] !== n);
+      edges[i].classList.toggle('in', e[1] === n && e[0] !== n);
+    });
+    var c = chunk(n);
+    detail.innerHTML = '';
+    var h = document.createElement('h2');
+    h.textContent = graph.nodes[n][0];
+    detail.appendChild(h);
+    neighbours('Output to', c.to);
+    neighbours('Input from', c.from);
+    list('Output signals', c.out);
+    list('Input signals', c.in);
+  }
+})();
+</script>
+</body>
+</html>
+'''
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sqldbfile = sys.argv[1]
+    snapshot = load_snapshot(sqldbfile)
+    sig_dict, mod_dict, hlrout_dict, hlrin_dict = snapshot.model()
+    snapshot.close()
+    write_html(sig_dict, mod_dict, hlrout_dict, hlrin_dict)
+    print(f'{len(mod_dict)} modules and {len(sig_dict)} signals written to {htmlfile}')
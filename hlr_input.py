@@ -0,0 +1,127 @@
+# hlr_input.py
+# Input layer for the HLR exports: plain files, or members of .zip, .tar, .tar.gz/.tgz and .gz archives, read
+# directly from the archive without extracting it to disk.
+#
+# An input is named by a source string: the path of a plain file, or 'archive!member' for a member of an archive.
+# The module name is taken from the file name of the member, the same way as for a plain file, e.g.
+# exports.zip!HLR/hlr10.txt is module HLR10.
+#
+# Usage from the parsers:
+#   for filename, source, hlrfile in iter_inputs(paths, '*.txt'):
+#       module_name = module_name_of(filename)
+#       ...                                   # read hlrfile before asking for the next input
+# and to go back to one source later:
+#   with open_input(source) as hlrfile:       # binary, seekable
+#       ...
+
+import os
+import re
+import glob
+import fnmatch
+import gzip
+import tarfile
+import zipfile
+
+archive_separator = '!'
+archive_suffix = re.compile(r'\.(zip|tar\.gz|tgz|tar|gz)!', re.IGNORECASE)
+
+
+def is_archive(path):
+    name = path.lower()
+    return name.endswith(('.zip', '.tar', '.tar.gz', '.tgz', '.gz'))
+
+
+def module_name_of(filename):
+    filename = os.path.basename(filename)
+    return filename[0:filename.find(".")].upper()
+
+
+# Yield (filename, source, hlrfile) for each input matching pattern; paths are plain files, directories or
+# archives.  hlrfile is open for reading in binary and is only valid until the next input is asked for.  Each
+# archive is opened once and its members are read in archive order, so a compressed tar is decompressed in a
+# single pass.  With no paths, the files matching pattern in the current directory are used, as before.
+def iter_inputs(paths, pattern):
+    if len(paths) == 0:
+        paths = glob.glob(pattern)
+    for path in paths:
+        if os.path.isdir(path):
+            for filename in sorted(glob.glob(os.path.join(path, pattern))):
+                with open(filename, 'rb') as hlrfile:
+                    yield os.path.basename(filename), os.path.abspath(filename), hlrfile
+        elif is_archive(path):
+            archive = os.path.abspath(path)
+            name = archive.lower()
+            if name.endswith('.zip'):
+                with zipfile.ZipFile(archive) as zip:
+                    for info in zip.infolist():
+                        if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), pattern):
+                            with zip.open(info) as hlrfile:
+                                yield (os.path.basename(info.filename),
+                                       archive + archive_separator + info.filename, hlrfile)
+            elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+                with tarfile.open(archive, 'r|*') as tar:  # stream mode, members in order
+                    for info in tar:
+                        if info.isfile() and fnmatch.fnmatch(os.path.basename(info.name), pattern):
+                            with tar.extractfile(info) as hlrfile:
+                                yield os.path.basename(info.name), archive + archive_separator + info.name, hlrfile
+            else:  # .gz holds one file, named like the archive without .gz
+                member = os.path.basename(archive)[:-3]
+                if fnmatch.fnmatch(member, pattern):
+                    with gzip.open(archive, 'rb') as hlrfile:
+                        yield member, archive + archive_separator + member, hlrfile
+        else:
+            with open(path, 'rb') as hlrfile:
+                yield os.path.basename(path), os.path.abspath(path), hlrfile
+
+
+# Split a source into (archive, member), or (path, None) for a plain file.  The split is at the last archive
+# suffix followed by the separator, so a '!' elsewhere in the archive path is kept.
+def split_source(source):
+    split = None
+    for match in archive_suffix.finditer(source):
+        split = match
+    if split is None:
+        return source, None
+    return source[:split.end() - 1], source[split.end():]
+
+
+# Open a single source for reading in binary, e.g. for hlr_source.py; archive members are decompressed as they
+# are read.  Use iter_inputs() to read all the inputs, it opens each archive only once.
+def open_input(source):
+    archive, member = split_source(source)
+    if member is None:
+        return open(source, 'rb')
+    name = archive.lower()
+    if name.endswith('.zip'):
+        return ArchiveMember(zipfile.ZipFile(archive), lambda zip: zip.open(member))
+    elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+        return ArchiveMember(tarfile.open(archive, 'r:*'), lambda tar: tar.extractfile(member))
+    else:
+        return gzip.open(archive, 'rb')
+
+
+# A member file object that also closes the archive it was opened from
+class ArchiveMember:
+    def __init__(self, archive, open_member):
+        self.archive = archive
+        try:
+            self.member = open_member(archive)
+        except BaseException:
+            archive.close()
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self.member, name)
+
+    def __iter__(self):
+        return iter(self.member)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.member.close()
+        self.archive.close()
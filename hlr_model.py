@@ -0,0 +1,82 @@
+# hlr_model.py
+# Load the signal model from an hlr.db database created by parse_hlr4.py.
+#
+# Returns the dictionaries of steps 1) - 4) of parse_hlr4.py:
+#   sig_dict    { sig_id : sig_name }
+#   mod_dict    { mod_id : mod_name }
+#   hlrout_dict { sig_id : [hlr_out] }
+#   hlrin_dict  { sig_id : [hlr_in] }
+# The output and input module lists are read with one query each, instead of one query per signal.
+#
+# Hyperedges: a signal goes from a set of output modules to a set of input modules.  Instead of expanding every
+# signal into all of its (hlr_out, hlr_in) pairs, signals with the same output and input sets are kept together as
+# one hyperedge (out_ids, in_ids, [sig_ids]).  The pairs are expanded once per hyperedge, and the signal count of a
+# pair is the sum of the sizes of its hyperedges; the signal list of a pair is only built when it is asked for,
+# e.g. when the .csv file is written.
+
+import heapq
+
+
+def load_model(cur):
+    sig_dict = {}
+    cur.execute('SELECT sig_id, sig_name FROM signals')
+    for row in cur:
+        sig_dict[row[0]] = row[1]
+
+    mod_dict = {}
+    cur.execute('SELECT mod_id, mod_name FROM modules')
+    for row in cur:
+        mod_dict[row[0]] = row[1]
+
+    hlrout_dict = {id: [] for id in sig_dict}
+    hlrin_dict = {id: [] for id in sig_dict}
+    cur.execute("SELECT DISTINCT mod_sig_type, sig_id, mod_id FROM modsigs "
+                "WHERE mod_sig_type IN ('Output', 'Input') ORDER BY sig_id, mod_id")
+    for mod_sig_type, sig_id, mod_id in cur:
+        if mod_sig_type == "Output":
+            hlrout_dict[sig_id].append(mod_id)
+        else:
+            hlrin_dict[sig_id].append(mod_id)
+
+    return sig_dict, mod_dict, hlrout_dict, hlrin_dict
+
+
+# Group the signals into hyperedges [(out_ids, in_ids, [sig_ids])], in order of their first signal.
+# The id tuples keep the order of list(set(...)) so the pairs come out in the same order as the all-pairs loop.
+def build_hyperedges(sig_dict, hlrout_dict, hlrin_dict):
+    hyperedges = {}
+    for id in sig_dict:
+        outlist = tuple(set(hlrout_dict[id]))  # use set to scrub for unique
+        inlist = tuple(set(hlrin_dict[id]))
+        key = (frozenset(outlist), frozenset(inlist))
+        if key in hyperedges:
+            hyperedges[key][2].append(id)
+        else:
+            hyperedges[key] = (outlist, inlist, [id])
+    return list(hyperedges.values())
+
+
+# Index the (hlr_out, hlr_in) pairs of the hyperedges { (hlrout,hlrin) : [hyperedge index] }.
+# single_input=True only uses the signals that go to one input module.
+def pair_index(hyperedges, single_input=False):
+    pairs = {}
+    for n, (outlist, inlist, sigs) in enumerate(hyperedges):
+        if single_input and len(inlist) != 1:
+            continue
+        for x in outlist:
+            for y in inlist:
+                if (x, y) in pairs:
+                    pairs[(x, y)].append(n)
+                else:
+                    pairs[(x, y)] = [n]
+    return pairs
+
+
+# Number of signals between a pair of modules
+def pair_count(hyperedges, edge_list):
+    return sum(len(hyperedges[n][2]) for n in edge_list)
+
+
+# Signals between a pair of modules, in sig_id order
+def pair_signals(hyperedges, edge_list):
+    return heapq.merge(*[hyperedges[n][2] for n in edge_list])
@@ -0,0 +1,229 @@
+# hlr_snapshot.py
+# Binary snapshot of the parsed signal model, for tools that would otherwise rebuild sig_dict, mod_dict,
+# hlrout_dict and hlrin_dict from hlr.db row by row.
+#
+# parse_hlr4.py writes the snapshot (hlr.snap next to hlr.db) at the end of a parse.  It holds the module and
+# signal name tables and the occurrence and hyperedge (see hlr_model.py) data as flat integer arrays.  Loading maps
+# the file with mmap and casts each array to a memoryview, so no Python object is created per row until a value is
+# looked up.
+#
+# File layout (little-endian):
+#   header   magic 'HLRSNAP\0', version, fingerprint of the database file (size, mtime in ns and the SQLite file
+#            change counter), crc32 of everything after the header
+#   sections in the order of section_names, each one a count, an item size, and the data padded to 8 bytes
+#     names are stored as utf-8 bytes with an offset array, n+1 entries, to slice them out
+#     hyperedges are stored in CSR form: ptr array (n+1 entries) and the concatenated id arrays
+#
+# The fingerprint of the database detects a snapshot that is stale (the database was written after it) without
+# reading the whole database, and the crc32 a damaged file; either way load_snapshot() rebuilds the snapshot from
+# the database.
+
+# Usage: python hlr_snapshot.py [dbfile]  (rebuild the snapshot and print a summary)
+
+import sys
+import os
+import struct
+import zlib
+import mmap
+import array
+import sqlite3
+
+from hlr_model import load_model, build_hyperedges
+
+snapshot_magic = b'HLRSNAP\0'
+snapshot_version = 2
+header_format = '<8sIQqII'
+section_format = '<QI4x'
+
+io_types = ['None', 'Input', 'Output']
+
+section_names = [
+    'mod_ids', 'mod_name_offsets', 'mod_names',
+    'sig_ids', 'sig_name_offsets', 'sig_names',
+    'occ_type', 'occ_line', 'occ_mod', 'occ_sig',
+    'edge_out_ptr', 'edge_out_ids', 'edge_in_ptr', 'edge_in_ids', 'edge_sig_ptr', 'edge_sig_ids',
+]
+
+
+def snapshot_file(sqldbfile):
+    return os.path.splitext(sqldbfile)[0] + '.snap'
+
+
+# (size, mtime_ns, change counter) of the database file; SQLite increments the file change counter, a big-endian
+# integer at offset 24 of the database header, on every transaction that changes the database
+def database_fingerprint(sqldbfile):
+    status = os.stat(sqldbfile)
+    with open(sqldbfile, 'rb') as dbfile:
+        header = dbfile.read(100)
+    change_counter = struct.unpack_from('>I', header, 24)[0] if len(header) >= 28 else 0
+    return status.st_size, status.st_mtime_ns, change_counter
+
+
+# Names as utf-8 bytes and an array of offsets into them
+def name_table(names):
+    offsets = array.array('I', [0])
+    data = bytearray()
+    for name in names:
+        data += name.encode('utf-8')
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+# Write the snapshot of the database from its model, as built by hlr_model.load_model() and build_hyperedges();
+# the connection must be committed so the fingerprint matches the file
+def write_snapshot(cur, sqldbfile, sig_dict, mod_dict, hyperedges):
+    sections = {}
+    sections['mod_ids'] = array.array('i', mod_dict.keys())
+    sections['mod_name_offsets'], sections['mod_names'] = name_table(mod_dict.values())
+    sections['sig_ids'] = array.array('i', sig_dict.keys())
+    sections['sig_name_offsets'], sections['sig_names'] = name_table(sig_dict.values())
+
+    for name in ['occ_type', 'occ_line', 'occ_mod', 'occ_sig']:
+        sections[name] = array.array('i')
+    cur.execute('SELECT mod_sig_type, mod_sig_line, mod_id, sig_id FROM modsigs')
+    for mod_sig_type, mod_sig_line, mod_id, sig_id in cur:
+        sections['occ_type'].append(io_types.index(mod_sig_type))
+        sections['occ_line'].append(mod_sig_line)
+        sections['occ_mod'].append(mod_id)
+        sections['occ_sig'].append(sig_id)
+
+    for part, column in [('out', 0), ('in', 1), ('sig', 2)]:
+        ptr = array.array('I', [0])
+        ids = array.array('i')
+        for hyperedge in hyperedges:
+            ids.extend(hyperedge[column])
+            ptr.append(len(ids))
+        sections[f'edge_{part}_ptr'] = ptr
+        sections[f'edge_{part}_ids'] = ids
+
+    body = bytearray()
+    for name in section_names:
+        data = sections[name]
+        if isinstance(data, array.array):
+            if sys.byteorder != 'little':
+                data = array.array(data.typecode, data)
+                data.byteswap()
+            count, itemsize, data = len(data), data.itemsize, data.tobytes()
+        else:
+            count, itemsize = len(data), 1
+        body += struct.pack(section_format, count, itemsize)
+        body += data
+        body += bytes(-len(data) % 8)
+
+    header = struct.pack(header_format, snapshot_magic, snapshot_version,
+                         *database_fingerprint(sqldbfile), zlib.crc32(body))
+    snapfile = snapshot_file(sqldbfile)
+    with open(snapfile + '.tmp', 'wb') as myFile:
+        myFile.write(header)
+        myFile.write(body)
+    os.replace(snapfile + '.tmp', snapfile)
+
+
+# Write the snapshot of the database, loading the model from it
+def rebuild_snapshot(sqldbfile):
+    con = sqlite3.connect(sqldbfile)
+    cur = con.cursor()
+    sig_dict, mod_dict, hlrout_dict, hlrin_dict = load_model(cur)
+    write_snapshot(cur, sqldbfile, sig_dict, mod_dict, build_hyperedges(sig_dict, hlrout_dict, hlrin_dict))
+    con.close()
+
+
+class Snapshot:
+    # Open and check a snapshot file; raises ValueError if it is damaged or does not match the database
+    def __init__(self, snapfile, sqldbfile):
+        with open(snapfile, 'rb') as myFile:
+            self.map = mmap.mmap(myFile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        try:
+            self.read_sections(sqldbfile)
+        except (ValueError, TypeError, struct.error) as error:
+            self.close()
+            raise ValueError(str(error))
+
+    def read_sections(self, sqldbfile):
+        if sys.byteorder != 'little':
+            raise ValueError('snapshot arrays are little-endian')
+        header_size = struct.calcsize(header_format)
+        if len(self.view) < header_size:
+            raise ValueError('snapshot is truncated')
+        magic, version, size, mtime_ns, change_counter, crc = struct.unpack_from(header_format, self.view)
+        if magic != snapshot_magic or version != snapshot_version:
+            raise ValueError('not a snapshot of this version')
+        if (size, mtime_ns, change_counter) != database_fingerprint(sqldbfile):
+            raise ValueError('snapshot is stale')
+        if zlib.crc32(self.view[header_size:]) != crc:
+            raise ValueError('snapshot is damaged')
+
+        position = header_size
+        for name in section_names:
+            count, itemsize = struct.unpack_from(section_format, self.view, position)
+            position += struct.calcsize(section_format)
+            data = self.view[position:position + count * itemsize]
+            position += count * itemsize + (-(count * itemsize) % 8)
+            if itemsize == 4:
+                data = data.cast('I' if name.endswith(('_offsets', '_ptr')) else 'i')
+            setattr(self, name, data)
+
+    def close(self):
+        for name in section_names:
+            if hasattr(self, name):
+                getattr(self, name).release()
+                delattr(self, name)
+        self.view.release()
+        self.map.close()
+
+    def module_count(self):
+        return len(self.mod_ids)
+
+    def signal_count(self):
+        return len(self.sig_ids)
+
+    def mod_name(self, n):
+        return bytes(self.mod_names[self.mod_name_offsets[n]:self.mod_name_offsets[n + 1]]).decode('utf-8')
+
+    def sig_name(self, n):
+        return bytes(self.sig_names[self.sig_name_offsets[n]:self.sig_name_offsets[n + 1]]).decode('utf-8')
+
+    # Hyperedges in the form of hlr_model.build_hyperedges() [(out_ids, in_ids, [sig_ids])]
+    def hyperedges(self):
+        edges = []
+        for n in range(len(self.edge_sig_ptr) - 1):
+            edges.append((tuple(self.edge_out_ids[self.edge_out_ptr[n]:self.edge_out_ptr[n + 1]]),
+                          tuple(self.edge_in_ids[self.edge_in_ptr[n]:self.edge_in_ptr[n + 1]]),
+                          list(self.edge_sig_ids[self.edge_sig_ptr[n]:self.edge_sig_ptr[n + 1]])))
+        return edges
+
+    # The dictionaries of hlr_model.load_model() (sig_dict, mod_dict, hlrout_dict, hlrin_dict)
+    def model(self):
+        sig_dict = {self.sig_ids[n]: self.sig_name(n) for n in range(self.signal_count())}
+        mod_dict = {self.mod_ids[n]: self.mod_name(n) for n in range(self.module_count())}
+        hlrout_dict = {id: [] for id in sig_dict}
+        hlrin_dict = {id: [] for id in sig_dict}
+        for outlist, inlist, sigs in self.hyperedges():
+            for id in sigs:
+                hlrout_dict[id] = sorted(outlist)
+                hlrin_dict[id] = sorted(inlist)
+        return sig_dict, mod_dict, hlrout_dict, hlrin_dict
+
+
+# Load the snapshot of a database, rebuilding it first if it is missing, stale or damaged
+def load_snapshot(sqldbfile):
+    if not os.path.exists(sqldbfile):
+        raise FileNotFoundError(sqldbfile)
+    snapfile = snapshot_file(sqldbfile)
+    if os.path.exists(snapfile):
+        try:
+            return Snapshot(snapfile, sqldbfile)
+        except ValueError as error:
+            print(f'Rebuilding {snapfile}: {error}')
+    rebuild_snapshot(sqldbfile)
+    return Snapshot(snapfile, sqldbfile)
+
+
+if __name__ == '__main__':
+    sqldbfile = sys.argv[1] if len(sys.argv) > 1 else 'hlr.db'
+    rebuild_snapshot(sqldbfile)
+    snapshot = load_snapshot(sqldbfile)
+    print(f'{snapshot_file(sqldbfile)}: {snapshot.module_count()} modules, {snapshot.signal_count()} signals, '
+          f'{len(snapshot.occ_sig)} occurrences, {len(snapshot.edge_sig_ptr) - 1} hyperedges')
+    snapshot.close()
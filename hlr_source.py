@@ -0,0 +1,80 @@
+# hlr_source.py
+# This program will show the source text around each occurrence of a signal, e.g. to triage a dangling signal
+# during review.
+#
+# parse_hlr4.py records the byte offset and length of every signal occurrence and of its enclosing block (from the
+# heading before it to the next heading) in ModSigs, and the file it was read from in Files.  The excerpt is read
+# with a seek to the block, so it does not depend on the size of the export or on where the signal is in it.
+# Archive members are opened through hlr_input.py; a seek in a compressed member has to decompress up to the block.
+
+# Usage: python hlr_source.py SIGNAL [MODULE] [dbfile]
+#   e.g. python hlr_source.py "[WOW]" HLR10
+
+import sys
+import sqlite3
+
+from hlr_input import open_input
+
+# Define files
+sqldbfile = 'hlr.db'
+
+
+# Return [(module, io_type, line, text, signal_start, signal_end)] for the occurrences of a signal; text is the
+# enclosing block and signal_start/signal_end the position of the signal within it.
+def show_source(cur, signal_name, module_name=None):
+    query = '''SELECT m.mod_name, f.file_source, f.file_encoding, ms.mod_sig_type, ms.mod_sig_line,
+            ms.mod_sig_offset, ms.mod_sig_length, ms.mod_sig_block_offset, ms.mod_sig_block_length
+        FROM ModSigs ms
+        JOIN Modules m ON m.mod_id = ms.mod_id
+        JOIN Files f ON f.file_id = ms.file_id
+        JOIN Signals s ON s.sig_id = ms.sig_id
+        WHERE s.sig_name = ?'''
+    params = [signal_name]
+    if module_name is not None:
+        query += ' AND m.mod_name = ?'
+        params.append(module_name.upper())
+    query += ' ORDER BY m.mod_name, ms.file_id, ms.mod_sig_line'
+
+    excerpts = []
+    for (mod_name, file_source, file_encoding, sig_type, sig_line,
+         sig_offset, sig_length, block_offset, block_length) in cur.execute(query, params).fetchall():
+        with open_input(file_source) as hlrfile:
+            hlrfile.seek(block_offset)
+            block = hlrfile.read(block_length)
+        start = sig_offset - block_offset
+        end = start + sig_length
+        # Decode the parts separately so the signal position is kept in characters
+        before = block[:start].decode(file_encoding, errors='replace')
+        signal = block[start:end].decode(file_encoding, errors='replace')
+        after = block[end:].decode(file_encoding, errors='replace')
+        excerpts.append((mod_name, sig_type, sig_line, before + signal + after,
+                         len(before), len(before) + len(signal)))
+    return excerpts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python hlr_source.py SIGNAL [MODULE] [dbfile]')
+    signal_name = sys.argv[1]
+    module_name = sys.argv[2] if len(sys.argv) > 2 else None
+    if len(sys.argv) > 3:
+        sqldbfile = sys.argv[3]
+
+    con = sqlite3.connect(sqldbfile)
+    excerpts = show_source(con.cursor(), signal_name, module_name)
+    con.close()
+
+    if len(excerpts) == 0:
+        sys.exit(f'{signal_name} not found')
+    # Print the heading of the block and the lines around the signal
+    context = 5
+    for mod_name, sig_type, sig_line, text, start, end in excerpts:
+        print(f'==== {mod_name} line {sig_line} ({sig_type}) ====')
+        before = text[:start].splitlines()
+        after = text[end:].splitlines()
+        if len(before) > context:
+            print(before[0])
+            print('...')
+            before = before[-context:]
+        lines = before + ['>>' + text[start:end] + '<<'] + after[1:context + 1]
+        print('\n'.join(lines))
@@ -15,9 +15,10 @@ import re
 import glob
 import csv
 
+from hlr_cooccur import CoOccurrence
+
 signal_list = {}  # will contain a key:value; key = signal_name, value is a list[modules]
 modules = {}      # will contain a key:value; key = module name, value = flag if has signal pair
-hlr_list = {}     # will contain a key:value; key = (hlr pair), value is list[signals]
 
 csvfile = 'hlr_signals.csv'
 dotfile = 'hlr_signals.gfz'
@@ -58,20 +59,8 @@ for filename in glob.iglob('*.rtf'):
 print("====================")
 print("Total Signals:", len(signal_list))
 print("====================")
-for signal in sorted(signal_list):
-    if len(signal_list[signal]) > 1:
-        hlr_used = signal_list[signal]
-        hlr_used.sort()
-        for x in range(len(hlr_used) - 1):
-            for y in range(x + 1, len(hlr_used)):
-                hlr_tuple = (hlr_used[x], hlr_used[y])
-                if hlr_tuple in hlr_list:  # Append signal to signal's existing hlr list
-                    signals = hlr_list[hlr_tuple]
-                    if signal not in signals:
-                        signals.append(signal)
-                else:
-                    signals = [signal]  # Create a module list for new signal
-                hlr_list[hlr_tuple] = signals  # Create or update signal_list
+hlr_pairs = CoOccurrence(signal_list)  # Module x signal incidence matrix, see hlr_cooccur.py
+hlr_list = hlr_pairs.pairs  # will contain a key:value; key = (hlr pair), value is number of signals
 print("====================")
 print("Total HLR Pairs:", len(hlr_list))
 print("====================")
@@ -83,7 +72,7 @@ csv_data = [['HLR1', 'HLR2', 'Signals']]
 for hlr_pair in hlr_list:
     hlr1 = hlr_pair[0]
     hlr2 = hlr_pair[1]
-    for sig in hlr_list[hlr_pair]:
+    for sig in hlr_pairs.pair_signals(hlr_pair):
         csv_row = [hlr1, hlr2, sig]
         csv_data.append(csv_row)
 #         csv_row = [hlr2, hlr1, sig]
@@ -113,7 +102,7 @@ myFile.write("graph HLR {\n")
 for hlr_pair in hlr_list:
     hlr1 = hlr_pair[0][:5]
     hlr2 = hlr_pair[1][:5]
-    sigcount = len(hlr_list[hlr_pair])
+    sigcount = hlr_list[hlr_pair]
     myFile.write(f'  {hlr1} -- {hlr2} [label="{sigcount}"]\n')
 
 myFile.write("}\n")
@@ -27,6 +27,8 @@ import csv
 import codecs
 import sqlite3
 
+from hlr_model import build_hyperedges, pair_index, pair_count, pair_signals
+
 # Define files
 sqldbfile = 'hlr.db'
 csvfile = 'hlr_signals.csv'
@@ -131,19 +133,10 @@ for id in list(sig_dict.keys()):
 con.close()
 
 
-# 5) Collect vectors of from-to hlr modules and their list of signals {(hlrout,hlrin):[sigs]}
-vector_list = {}
-for id in list(sig_dict.keys()):
-    outlist = list(set(hlrout_dict[id]))  # use set to scrub for unique
-    inlist = list(set(hlrin_dict[id]))
-    hlr_pair_list = [(x, y) for x in outlist for y in inlist]
-    for hlr_pair in hlr_pair_list:
-        if hlr_pair in vector_list:
-            sigs = vector_list[hlr_pair]
-            sigs.append(id)
-            vector_list[hlr_pair] = sigs
-        else:
-            vector_list[hlr_pair] = [id]
+# 5) Group the signals into hyperedges (hlr_out set, hlr_in set, [sigs]) and index the from-to hlr module pairs
+#    {(hlrout,hlrin):[hyperedges]} (see hlr_model.py); the signals of a pair are only listed when they are written
+hyperedges = build_hyperedges(sig_dict, hlrout_dict, hlrin_dict)
+vector_list = pair_index(hyperedges)
 
 # cnt = 0
 # for vector in vector_list:
@@ -157,7 +150,7 @@ csv_data = [['HLR_Out', 'HLR_In', 'Signals']]
 for vector in vector_list:
     hlr_out = mod_dict[vector[0]]
     hlr_in = mod_dict[vector[1]]
-    for sig in vector_list[vector]:
+    for sig in pair_signals(hyperedges, vector_list[vector]):
         signal = sig_dict[sig]
         csv_row = [hlr_out, hlr_in, signal]
         csv_data.append(csv_row)
@@ -181,7 +174,7 @@ myFile.write('HLR10 [color="yellow"];\n')
 for vector in vector_list:
     hlr_out = mod_dict[vector[0]]
     hlr_in = mod_dict[vector[1]]
-    count_label = str(len(vector_list[vector]))
+    count_label = str(pair_count(hyperedges, vector_list[vector]))
     if (hlr_out == hlr_in):
         myFile.write(f'  {hlr_out} -> {hlr_in} [label="{count_label}", color="red", fontcolor="red"];\n')
     else:
@@ -198,20 +191,7 @@ myFile.close()
 #     for j in hlrin_dict[i]:
 #         print("  ", j, mod_dict[j])
 
-vector_list = {}
-for id in list(sig_dict.keys()):
-    outlist = list(set(hlrout_dict[id]))  # use set to scrub for unique
-    inlist = list(set(hlrin_dict[id]))
-    if len(inlist) == 1:
-        hlr_pair_list = [(x, y) for x in outlist for y in inlist]
-        for hlr_pair in hlr_pair_list:
-            if hlr_pair in vector_list:
-                sigs = vector_list[hlr_pair]
-                sigs.append(id)
-                vector_list[hlr_pair] = sigs
-            else:
-                vector_list[hlr_pair] = [id]
-                sigs = vector_list[hlr_pair]
+vector_list = pair_index(hyperedges, single_input=True)
 
 
 # cnt = 0
@@ -230,7 +210,7 @@ for vector in vector_list:
         hlr_out = mod_dict[vector[0]]
         hlr_in = mod_dict[vector[1]]
         if (hlr_out in input_output_modules) or  (hlr_in in input_output_modules):
-            for sig in vector_list[vector]:
+            for sig in pair_signals(hyperedges, vector_list[vector]):
                 signal =  sig_dict[sig]
                 csv_row = [hlr_out, hlr_in, signal]
                 csv_data.append(csv_row)
@@ -257,7 +237,7 @@ for vector in vector_list:
         hlr_out = mod_dict[vector[0]]
         hlr_in = mod_dict[vector[1]]
         if (hlr_out in input_output_modules) or  (hlr_in in input_output_modules):
-            count_label = str(len(vector_list[vector]))
+            count_label = str(pair_count(hyperedges, vector_list[vector]))
             if (hlr_out == hlr_in):
                 myFile.write(f'  {hlr_out} -> {hlr_in} [label="{count_label}", color="red", fontcolor="red"];\n')
             else:
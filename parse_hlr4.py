@@ -16,160 +16,281 @@
 #   - Any line that begins with a tab is DOORS attribute data.
 #   - Any text that begins in the first character of the line is requirements text.
 
-# Usage: python parse_hlr3.py  (execute in directory with HLR text files)
+# Usage: python parse_hlr4.py [dbfile [input ...]]  (execute in directory with HLR text files)
+#   dbfile defaults to hlr.db; give each program/release its own so hlr_federate.py can query across them.
+#   inputs follow the dbfile, and are .txt files, directories, or .zip/.tar/.tar.gz/.gz archives whose .txt
+#   members are read without extracting them (see hlr_input.py); with no inputs the .txt files in the current
+#   directory are parsed.
 
 # Note: This version identifies signals with the module they are found in.
 
 import sys
 import re
-import glob
 import csv
 import codecs
 import sqlite3
+import locale
+import queue
+import threading
+import hashlib
+
+from hlr_input import iter_inputs, module_name_of
+from hlr_model import load_model, build_hyperedges, pair_index, pair_count, pair_signals
+from hlr_snapshot import write_snapshot
 
 # Define files
-sqldbfile = 'hlr.db'
+sqldbfile = sys.argv[1] if len(sys.argv) > 1 else 'hlr.db'
+inputs = sys.argv[2:]
 csvfile = 'hlr_signals.csv'
 csvfile2 = 'hlr_signals2.csv'
 dotfile = 'hlr_signals.gfz'
 dotfile2 = 'hlr_signals2.gfz'
+encoding = locale.getpreferredencoding(False)  # same decoding as reading the files in text mode
 
 # Set up sqlite database
 con = sqlite3.connect(sqldbfile)
 cur = con.cursor()
 
 cur.execute("DROP TABLE IF EXISTS Modules")
+cur.execute("DROP TABLE IF EXISTS Files")
 cur.execute("DROP TABLE IF EXISTS Signals")
 cur.execute("DROP TABLE IF EXISTS ModSigs")
 cur.execute("CREATE TABLE Modules (mod_id INTEGER PRIMARY KEY, mod_name TEXT, UNIQUE (mod_name))")
+cur.execute("CREATE TABLE Files (file_id INTEGER PRIMARY KEY, file_source TEXT, file_encoding TEXT, \
+                file_hash TEXT, mod_id INTEGER, \
+                FOREIGN KEY(mod_id) REFERENCES Modules(mod_id))")
 cur.execute("CREATE TABLE Signals (sig_id INTEGER PRIMARY KEY, sig_name TEXT, UNIQUE (sig_name))")
 cur.execute("CREATE TABLE ModSigs (mod_sig_type TEXT, mod_sig_line INTEGER, \
-                mod_id INTEGER, sig_id INTEGER, \
+                mod_sig_offset INTEGER, mod_sig_length INTEGER, \
+                mod_sig_block_offset INTEGER, mod_sig_block_length INTEGER, \
+                mod_id INTEGER, sig_id INTEGER, file_id INTEGER, \
                 FOREIGN KEY(mod_id) REFERENCES Modules(mod_id), \
-                FOREIGN KEY (sig_id) REFERENCES Signals(sig_id))")
-
+                FOREIGN KEY (sig_id) REFERENCES Signals(sig_id), \
+                FOREIGN KEY (file_id) REFERENCES Files(file_id))")
 
-# Parse all txt files for signals and store results in database
-for filename in glob.iglob('*.txt'):
-    hlrfile = open(filename, "r")
-    hlrfile_line_count = 0
-    module_name = filename[0:filename.find(".")].upper()
-    title = "Not Assigned"
-    io_state = "None" # This is a flag that should be one of None, Input, Output
-    line_type = "None" # This is a flag for each line; None, Signal, Attribute, Requirement, Heading
-
-    # Insert module name into the database, get the row_id for the FK relations
-    cur.execute('INSERT OR IGNORE INTO Modules (mod_name) VALUES (?)', (module_name,))
-    cur.execute('SELECT mod_id FROM Modules WHERE mod_name = ?', (module_name,))
-    module_id = cur.fetchone()[0]
-
-    for line in hlrfile:    # Parse file for all [signal_names] and module name
-        # Determine line_type and extract signal name and type
-        hlrfile_line_count += 1
-        line = line.rstrip()
-
-        if len(line) > 0:
-            signals = re.findall(r'(\[(.*?)\])', line) # returns a list of tuples ([signal], signal) if present
-            line_type = "Requirement"
-
-            if line[0] == "\t": # lines beginning with tab are DOORS attributes
-                line_type = "Attribute"
-            elif len(signals) == 1 and line == signals[0][0]: # regex determined line is a signal name
-                line_type = "Signal"
-                signal_name = line
-                cur.execute('INSERT OR IGNORE INTO Signals (sig_name) VALUES (?)', (signal_name,))
-                cur.execute('SELECT sig_id FROM Signals WHERE sig_name = ?', (signal_name,))
-                signal_id = cur.fetchone()[0]
-                if signal_name == "[P0]":
-                    print(signal_name, module_name, io_state, hlrfile_line_count, module_id, signal_id)
-                cur.execute('INSERT INTO ModSigs (mod_sig_type, mod_sig_line, mod_id, sig_id) \
-                    VALUES (?,?,?,?)', (io_state, hlrfile_line_count, module_id, signal_id))
-
-            elif line[0].isnumeric(): # line starting with a number are headings
-                line_type = "Heading"
-                if line.find("Input") >= 0 and line.find("Output") == -1: # heading starts input section
-                    io_state = "Input"
-                elif line.find("Output") >= 0 and line.find("Input") == -1: # heading starts output section
-                    io_state = "Output"
-                else:
-                    io_state = "None" # some other kind of heading
-
-# Commit and close database
-con.commit()
-
-# 1) Create a dictionary of all signals { sig_id : sig_name}
-sig_dict = {}
-cur.execute('SELECT sig_id, sig_name FROM signals')
-for row in cur:
-    sig_dict[row[0]] = row[1]
-    if row[1] == "[P0]":
-        print(row)
-
-
-# 2) Create a dictionary of all modules { mod_id : mod_name}
-mod_dict = {}
-cur.execute('SELECT mod_id, mod_name FROM modules')
-for row in cur:
-    mod_dict[row[0]] = row[1]
-
-
-# 3) For each signal, build the list of output modules { sig_id : [hlr_out] }
-hlrout_dict = {}
-for id in list(sig_dict.keys()):
-    cur.execute(f'SELECT distinct mod_id FROM modsigs WHERE mod_sig_type = "Output" and sig_id = {id}')
-    mods = []
-    for mod in cur.fetchall():
-        mods.append(mod[0])
-        if id == 397:
-            print("Output", mod)
-    hlrout_dict[id] = mods
-
-
-# 4) For each signal, build the list of input modules { sig_id : [hlr_in] }
-hlrin_dict = {}
-for id in list(sig_dict.keys()):
-    cur.execute(f'SELECT distinct mod_id FROM modsigs WHERE mod_sig_type = "Input" and sig_id = {id}')
-    mods = []
-    for mod in cur.fetchall():
-        mods.append(mod[0])
-        if id == 397:
-            print("Input", mod)
-    hlrin_dict[id] = mods
+con.commit()  # the writer thread uses its own connection
 
-con.close()
 
+# Parse all txt files for signals and store results in database
+# The parse runs as a pipeline of three threads connected by bounded queues, so reading the files, classifying
+# the lines and writing to SQLite overlap, and no more than queue_size batches are held in memory at a time:
+#   - reader:     reads the files, or archive members, in binary, in batches of about batch_bytes, and hashes them
+#   - classifier: tracks the heading state of each file and finds the signal lines
+#   - writer:     the only thread using the database; interns the names and inserts the rows, committing in batches
+# A stage that fails passes the end marker on and, unless it already took the end marker of its input, drains its
+# input, so the other stages do not block; the error is raised again when the threads have finished.
+#
+# The files are read in binary so the byte offset of each line is known; every signal occurrence records its
+# offset and length, and the offset and length of its enclosing block (from the last heading to the next one),
+# so hlr_source.py can seek straight to the source text.  The file each occurrence was read from is in Files, as
+# several files can add to one module.
+queue_size = 64
+batch_bytes = 1 << 16
+commit_rows = 10000
+end_of_input = None
+stage_errors = []
+
+
+# A queue with one consumer that remembers whether the end marker has been taken from it
+class StageQueue(queue.Queue):
+    ended = False
+
+    def get(self):
+        item = super().get()
+        if item is end_of_input:
+            self.ended = True
+        return item
+
+
+def run_stage(stage, in_queue, out_queue):
+    try:
+        stage(in_queue, out_queue)
+    except BaseException as error:
+        stage_errors.append(error)
+        if in_queue is not None and not in_queue.ended:
+            while in_queue.get() is not end_of_input:  # drain so the stage before does not block
+                pass
+    finally:
+        if out_queue is not None:
+            out_queue.put(end_of_input)
+
+
+# Reader: ('file', filename, source), ('lines', [raw_line]) batches, ('end_file', sha1) for each file.
+# Files that map to the same module, e.g. hlr1.txt and hlr1.extra.txt, are all read and add to that module.
+def reader_stage(in_queue, out_queue):
+    for filename, source, hlrfile in iter_inputs(inputs, '*.txt'):
+        if stage_errors:
+            break
+        out_queue.put(('file', filename, source))
+        digest = hashlib.sha1()
+        lines = hlrfile.readlines(batch_bytes)
+        while lines:
+            for raw_line in lines:
+                digest.update(raw_line)
+            out_queue.put(('lines', lines))
+            lines = hlrfile.readlines(batch_bytes)
+        out_queue.put(('end_file', digest.hexdigest()))
+
+
+# Classifier: ('file', module_name, source) and ('hash', sha1) for each file and ('rows', [row]) for
+# each block of signals, row = (io_state, line, offset, length, block_offset, block_length, module_name, signal_name)
+def classify_stage(in_queue, out_queue):
+    item = in_queue.get()
+    while item is not end_of_input:
+        if item[0] == 'file':
+            filename = item[1]
+            hlrfile_line_count = 0
+            hlrfile_offset = 0
+            block_offset = 0  # Offset of the current heading, the start of the block enclosing the signals
+            block_rows = []   # Signal rows of the current block, sent when the block length is known
+            module_name = module_name_of(filename)
+            io_state = "None" # This is a flag that should be one of None, Input, Output
+            out_queue.put(('file', module_name, item[2]))
+
+        elif item[0] == 'end_file':
+            # The end of the file ends the last block of the file
+            if block_rows:
+                out_queue.put(('rows', block_length(block_rows, hlrfile_offset - block_offset)))
+                block_rows = []
+            out_queue.put(('hash', item[1]))
 
-# 5) Collect vectors of from-to hlr modules and their list of signals {(hlrout,hlrin):[sigs]}
-vector_list = {}
-for id in list(sig_dict.keys()):
-    outlist = list(set(hlrout_dict[id]))  # use set to scrub for unique
-    inlist = list(set(hlrin_dict[id]))
-    hlr_pair_list = [(x, y) for x in outlist for y in inlist]
-    for hlr_pair in hlr_pair_list:
-        if hlr_pair in vector_list:
-            sigs = vector_list[hlr_pair]
-            sigs.append(id)
-            vector_list[hlr_pair] = sigs
         else:
-            vector_list[hlr_pair] = [id]
+            for raw_line in item[1]:    # Parse file for all [signal_names] and module name
+                # Determine the kind of line and extract signal name and type
+                hlrfile_line_count += 1
+                line_offset = hlrfile_offset
+                hlrfile_offset += len(raw_line)
+                line = raw_line.decode(encoding).rstrip()
+
+                if len(line) > 0:
+                    signals = re.findall(r'(\[(.*?)\])', line) # returns a list of tuples ([signal], signal) if present
+
+                    if line[0] == "\t": # lines beginning with tab are DOORS attributes
+                        pass
+                    elif len(signals) == 1 and line == signals[0][0]: # regex determined line is a signal name
+                        signal_name = line
+                        block_rows.append((io_state, hlrfile_line_count, line_offset,
+                                           len(signal_name.encode(encoding)), block_offset, module_name, signal_name))
+
+                    elif line[0].isnumeric(): # line starting with a number are headings
+                        # The heading ends the previous block
+                        if block_rows:
+                            out_queue.put(('rows', block_length(block_rows, line_offset - block_offset)))
+                            block_rows = []
+                        block_offset = line_offset
+                        if line.find("Input") >= 0 and line.find("Output") == -1: # heading starts input section
+                            io_state = "Input"
+                        elif line.find("Output") >= 0 and line.find("Input") == -1: # heading starts output section
+                            io_state = "Output"
+                        else:
+                            io_state = "None" # some other kind of heading
+
+        item = in_queue.get()
+
+
+def block_length(block_rows, length):
+    return [row[:5] + (length,) + row[5:] for row in block_rows]
+
+
+# Writer: the only stage using the database, with its own connection
+def writer_stage(in_queue, out_queue):
+    wcon = sqlite3.connect(sqldbfile)
+    try:
+        wcur = wcon.cursor()
+        mod_ids = {}
+        sig_ids = {}
+        file_id = None
+        uncommitted = 0
+
+        item = in_queue.get()
+        while item is not end_of_input:
+            if item[0] == 'file':
+                # Insert module name into the database, get the row_id for the FK relations
+                module_name = item[1]
+                wcur.execute('INSERT OR IGNORE INTO Modules (mod_name) VALUES (?)', (module_name,))
+                wcur.execute('SELECT mod_id FROM Modules WHERE mod_name = ?', (module_name,))
+                mod_ids[module_name] = wcur.fetchone()[0]
+                # The file the following rows are read from
+                wcur.execute('INSERT INTO Files (file_source, file_encoding, mod_id) VALUES (?,?,?)',
+                             (item[2], encoding, mod_ids[module_name]))
+                file_id = wcur.lastrowid
+            elif item[0] == 'hash':
+                wcur.execute('UPDATE Files SET file_hash = ? WHERE file_id = ?', (item[1], file_id))
+            else:
+                rows = []
+                for io_state, line, offset, length, block_offset, block_len, module_name, signal_name in item[1]:
+                    if signal_name not in sig_ids:
+                        wcur.execute('INSERT OR IGNORE INTO Signals (sig_name) VALUES (?)', (signal_name,))
+                        wcur.execute('SELECT sig_id FROM Signals WHERE sig_name = ?', (signal_name,))
+                        sig_ids[signal_name] = wcur.fetchone()[0]
+                    module_id = mod_ids[module_name]
+                    signal_id = sig_ids[signal_name]
+                    if signal_name == "[P0]":
+                        print(signal_name, module_name, io_state, line, module_id, signal_id)
+                    rows.append((io_state, line, offset, length, block_offset, block_len, module_id, signal_id,
+                                 file_id))
+                wcur.executemany('INSERT INTO ModSigs (mod_sig_type, mod_sig_line, mod_sig_offset, mod_sig_length, \
+                    mod_sig_block_offset, mod_sig_block_length, mod_id, sig_id, file_id) VALUES (?,?,?,?,?,?,?,?,?)',
+                                 rows)
+                uncommitted += len(rows)
+                if uncommitted >= commit_rows:
+                    wcon.commit()
+                    uncommitted = 0
+            item = in_queue.get()
+
+        wcon.commit()
+    finally:
+        wcon.close()
+
+
+line_queue = StageQueue(queue_size)
+row_queue = StageQueue(queue_size)
+stages = [threading.Thread(target=run_stage, args=(reader_stage, None, line_queue)),
+          threading.Thread(target=run_stage, args=(classify_stage, line_queue, row_queue)),
+          threading.Thread(target=run_stage, args=(writer_stage, row_queue, None))]
+for stage in stages:
+    stage.start()
+for stage in stages:
+    stage.join()
+if stage_errors:
+    raise stage_errors[0]
+
+
+# 1) - 4) Create the dictionaries of all signals { sig_id : sig_name}, all modules { mod_id : mod_name}, and for
+#    each signal the lists of output modules { sig_id : [hlr_out] } and input modules { sig_id : [hlr_in] }
+sig_dict, mod_dict, hlrout_dict, hlrin_dict = load_model(cur)
+for id in sig_dict:
+    if sig_dict[id] == "[P0]":
+        print((id, sig_dict[id]))
+if 397 in sig_dict:
+    for mod in hlrout_dict[397]:
+        print("Output", (mod,))
+    for mod in hlrin_dict[397]:
+        print("Input", (mod,))
+
+
+# 5) Group the signals into hyperedges (hlr_out set, hlr_in set, [sigs]) and index the from-to hlr module pairs
+#    {(hlrout,hlrin):[hyperedges]}; the signals of a pair are only listed when the csv file is written
+hyperedges = build_hyperedges(sig_dict, hlrout_dict, hlrin_dict)
+vector_list = pair_index(hyperedges)
+
+# Write the binary snapshot of the model for the query and graph tools
+write_snapshot(cur, sqldbfile, sig_dict, mod_dict, hyperedges)
+
+con.close()
 
 
 # 6) Write data to a csv file format suitable for pivot table analysis
 # Columns: HLR1, HLR2, Signal
-csv_data = [['HLR_Out', 'HLR_In', 'Signals']]
-
-for vector in vector_list:
-    hlr_out = mod_dict[vector[0]]
-    hlr_in = mod_dict[vector[1]]
-    for sig in vector_list[vector]:
-        signal = sig_dict[sig]
-        csv_row = [hlr_out, hlr_in, signal]
-        csv_data.append(csv_row)
-
 myFile = open(csvfile, 'w', newline='')
 with myFile:
     writer = csv.writer(myFile)
-    writer.writerows(csv_data)
+    writer.writerow(['HLR_Out', 'HLR_In', 'Signals'])
+    for vector in vector_list:
+        hlr_out = mod_dict[vector[0]]
+        hlr_in = mod_dict[vector[1]]
+        for sig in pair_signals(hyperedges, vector_list[vector]):
+            writer.writerow([hlr_out, hlr_in, sig_dict[sig]])
 myFile.close()
 
 
@@ -180,45 +301,27 @@ myFile.write("digraph HLR {\n")
 for vector in vector_list:
     hlr_out = mod_dict[vector[0]]
     hlr_in = mod_dict[vector[1]]
-    count_label = str(len(vector_list[vector]))
+    count_label = str(pair_count(hyperedges, vector_list[vector]))
     myFile.write(f'  {hlr_out} -> {hlr_in} [label="{count_label}"];\n')
 myFile.write("}\n")
 myFile.close()
 
-vector_list = {}
-for id in list(sig_dict.keys()):
-    outlist = list(set(hlrout_dict[id]))  # use set to scrub for unique
-    inlist = list(set(hlrin_dict[id]))
-    if len(inlist) == 1:
-        hlr_pair_list = [(x, y) for x in outlist for y in inlist]
-        for hlr_pair in hlr_pair_list:
-            if hlr_pair in vector_list:
-                sigs = vector_list[hlr_pair]
-                sigs.append(id)
-                vector_list[hlr_pair] = sigs
-            else:
-                vector_list[hlr_pair] = [id]
-                sigs = vector_list[hlr_pair]
+vector_list = pair_index(hyperedges, single_input=True)
 
 
 # 8) Write data to a csv file format suitable for pivot table analysis
 #    where there is only one input hlr
 #    Columns: HLR1, HLR2, Signal
-csv_data = [['HLR_Out', 'HLR_In', 'Signals']]
-
-for vector in vector_list:
-    if vector[0] != vector[1]:
-        hlr_out = mod_dict[vector[0]]
-        hlr_in = mod_dict[vector[1]]
-        for sig in vector_list[vector]:
-            signal =  sig_dict[sig]
-            csv_row = [hlr_out, hlr_in, signal]
-            csv_data.append(csv_row)
-
 myFile = open(csvfile2, 'w', newline='')
 with myFile:
-   writer = csv.writer(myFile)
-   writer.writerows(csv_data)
+    writer = csv.writer(myFile)
+    writer.writerow(['HLR_Out', 'HLR_In', 'Signals'])
+    for vector in vector_list:
+        if vector[0] != vector[1]:
+            hlr_out = mod_dict[vector[0]]
+            hlr_in = mod_dict[vector[1]]
+            for sig in pair_signals(hyperedges, vector_list[vector]):
+                writer.writerow([hlr_out, hlr_in, sig_dict[sig]])
 myFile.close()
 
 
@@ -231,7 +334,7 @@ for vector in vector_list:
     if vector[0] != vector[1]:
         hlr_out = mod_dict[vector[0]]
         hlr_in = mod_dict[vector[1]]
-        count_label = str(len(vector_list[vector]))
+        count_label = str(pair_count(hyperedges, vector_list[vector]))
         myFile.write(f'  {hlr_out} -> {hlr_in} [label="{count_label}"];\n')
 myFile.write("}\n")
 myFile.close()